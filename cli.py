@@ -8,7 +8,6 @@
 
 import argparse, os, sys
 from pathlib import Path
-import core
 
 VERSION = "0.2.0"
 
@@ -34,7 +33,10 @@ def main():
     if args.version:
         print(VERSION); return 0
 
-    root = os.path.abspath(args.root)
+    import core  # deferred so --version doesn't pay for the engine import
+
+    # scanners only os.path.join onto root, so a relative root works as-is (no getcwd)
+    root = os.path.normpath(args.root)
     graph = core.scan_repo(root)
     mermaid = core.build_mermaid(
         graph,
@@ -15,14 +15,18 @@
 # - "90% accurate in 1s" beats "99% accurate in 10s". It's a jumpstart, not a compiler.
 # - Output is human-first: gorgeous by default, trivial to tweak in README.
 
-import glob, json, os, re
+import errno, io, os, re, sys, time
+from collections import defaultdict
 from dataclasses import dataclass, field
-from pathlib import Path
-from typing import Dict, List, Set
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
 # ---------------------------- Data model ----------------------------
 
-@dataclass
+# Slotted instances (3.10+) drop the per-object __dict__; graphs hold many nodes/edges.
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(**_SLOTS)
 class Node:
     id: str
     label: str
@@ -30,33 +34,54 @@ class Node:
     tags: Set[str] = field(default_factory=set)  # e.g., {"db","public","svc","deploy"}
     ports: Set[str] = field(default_factory=set)
     meta: Dict[str, str] = field(default_factory=dict)
+    # render cache: "[]" or "()" and the Mermaid classes; filled on first render, cleared by Graph.tag()
+    render_shape: Optional[str] = field(default=None, repr=False, compare=False)
+    render_classes: Tuple[str, ...] = field(default=(), repr=False, compare=False)
 
-@dataclass
+@dataclass(**_SLOTS)
 class Edge:
     src: str
     dst: str
     label: str = ""
 
-@dataclass
+@dataclass(**_SLOTS)
 class Graph:
     nodes: Dict[str, Node] = field(default_factory=dict)
     edges: List[Edge] = field(default_factory=list)
     summary: str = ""
+    # indexes kept in step by node()/tag(), so callers never rescan self.nodes
+    _by_group: Dict[str, List[Node]] = field(default_factory=lambda: defaultdict(list), init=False, repr=False)
+    _public: List[Node] = field(default_factory=list, init=False, repr=False)
 
     def node(self, id, label=None, group="external", *, add_tag=None, ports=None, **meta):
         label = label or id
-        if id not in self.nodes:
-            self.nodes[id] = Node(id=id, label=label, group=group)
-        n = self.nodes[id]
+        n = self.nodes.get(id)
+        if n is None:
+            n = self.nodes[id] = Node(id=id, label=label, group=group)
+            self._by_group[group].append(n)
         n.label = n.label or label
         n.meta.update(meta)
         if add_tag:
-            if isinstance(add_tag, (list, set, tuple)): n.tags.update(add_tag)
-            else: n.tags.add(add_tag)
+            if isinstance(add_tag, (list, set, tuple)): self.tag(n, *add_tag)
+            else: self.tag(n, add_tag)
         if ports:
             n.ports.update(ports)
         return n
 
+    def tag(self, n, *tags):
+        # always tag through here: it maintains the public index
+        if "public" in tags and "public" not in n.tags:
+            self._public.append(n)
+        n.tags.update(tags)
+        n.render_shape = None
+        return n
+
+    def in_group(self, group):
+        return self._by_group.get(group, ())
+
+    def public_nodes(self):
+        return self._public
+
     def link(self, a, b, label=""):
         self.edges.append(Edge(src=a, dst=b, label=label))
 
@@ -71,104 +96,242 @@ DB_HINTS = {
     "elasticsearch": "Elasticsearch", "opensearch": "OpenSearch"
 }
 
-FRAMEWORK_HINTS = ("express","fastify","nest","koa","next","sveltekit","django","flask","fastapi","rails")
+# k8s manifests live under these top-level folders; the rest are never descended into
+K8S_DIRS = ("k8s","kubernetes","deploy","manifests","charts")
+SKIP_DIRS = frozenset((".git","node_modules",".venv","venv","dist","build","target","__pycache__"))
+
+# Size ceilings: past these a file is a dump/generated blob, not architecture info.
+MAX_ENV_BYTES = 1 << 20
+MAX_YAML_BYTES = 8 << 20
+
+FRAMEWORK_HINTS = frozenset(("express","fastify","nest","koa","next","sveltekit","django","flask","fastapi","rails"))
+
+# Compiled once at import; the scanners run these against every line of every file.
+# Scanner patterns are bytes: they only ever match ASCII, so files are never decoded
+# and only the captured names/ports are turned into str.
+_RE_SANITIZE = re.compile(r"[^A-Za-z0-9:_\-/\.]")
+_RE_SVC_SUFFIX = re.compile(r"-(svc|service)$")
+# package.json scripts (str: they come out of json.loads)
+_RE_PORT_ENV = re.compile(r"PORT\s*=\s*(\d+)")
+_RE_PORT_FLAG = re.compile(r"--port\s+(\d+)")
+# compose: one alternation classifies a line in a single match; order matters
+# (list items before keys), dispatch is on m.lastgroup. Nesting comes from 'indent'.
+_RE_COMPOSE_LINE = re.compile(
+    rb"^(?P<indent>[ \t]*)(?:"
+    rb"(?P<services>services\s*:\s*$)"
+    rb'|(?P<port>-\s*"?(?P<host>\d+)\s*:\s*(?P<container>\d+)(?:/(?:tcp|udp))?"?\s*$)'
+    rb"|(?P<item>-\s*(?P<itemname>[A-Za-z0-9._-]+)\s*$)"
+    rb"|(?P<key>(?P<keyname>[A-Za-z0-9._-]+)\s*:(?:\s.*)?$)"
+    rb")"
+)
+_COMPOSE_SUBKEYS = {b"depends_on": "depends_on", b"networks": "networks", b"ports": "ports"}
+# .env: every DB hint in one case-insensitive pass; longest first so 'postgresql' wins over 'postgres'
+_RE_DB_HINT = re.compile(b"|".join(re.escape(k.encode()) for k in sorted(DB_HINTS, key=len, reverse=True)), re.I)
+_DB_HINT_LABEL = {k.encode(): v for k, v in DB_HINTS.items()}
+# kubernetes
+_RE_KIND = re.compile(rb"^\s*kind\s*:\s*(Deployment|StatefulSet|DaemonSet|Service|Ingress)\s*$")
+_RE_TOP_KEY = re.compile(rb"^[A-Za-z][\w.-]*\s*:")
+_RE_SPEC_KEY = re.compile(rb"^(?:spec|items)\s*:")  # 'items' is kind: List (kubectl get -o yaml)
+_RE_LIST_KIND = re.compile(rb"^kind\s*:\s*List\s*$")  # items carry their own kinds
+_RE_NAME = re.compile(rb"^\s*name\s*:\s*([a-z0-9\-_.]+)\s*$")
+_RE_CONTAINER_PORT = re.compile(rb"containerPort\s*:\s*(\d+)")
+_RE_PORT = re.compile(rb"\bport\s*:\s*(\d+)")
+_RE_SVC_TYPE = re.compile(rb"\btype\s*:\s*(LoadBalancer|NodePort)\b", re.I)
+
+def _safe_open(path: str):
+    # Files are opened in parallel; back off and retry when the process runs out of fds.
+    delay = 0.01
+    for _ in range(10):
+        try:
+            return open(path, "rb")
+        except OSError as e:
+            if e.errno not in (errno.EMFILE, errno.ENFILE):
+                return None
+            time.sleep(delay); delay = min(delay * 2, 1.0)
+        except Exception:
+            return None
+    return None
 
-def _safe_read(path: str) -> str:
+def _safe_read(path: str) -> bytes:
+    f = _safe_open(path)
+    if f is None:
+        return b""
     try:
-        return Path(path).read_text(encoding="utf-8", errors="ignore")
+        return f.read()
     except Exception:
-        return ""
+        return b""
+    finally:
+        f.close()
 
+def _walk_yaml(root: str, subdirs=K8S_DIRS, skip=SKIP_DIRS):
+    """
+    Yield (top, path) for every *.yml/*.yaml file directly in root (top == "")
+    and anywhere below root/<subdir> (top == subdir). Hidden entries and `skip`
+    directories are pruned during the scan instead of being listed and filtered.
+    Order matches glob: a directory's files first, then its subdirectories.
+    """
+    def walk(top, path, recurse):
+        try:
+            it = os.scandir(path)
+        except OSError:
+            return
+        dirs = []
+        with it:
+            for e in it:
+                nm = e.name
+                if nm.startswith("."): continue
+                try:
+                    if e.is_dir(follow_symlinks=False):
+                        if recurse and nm not in skip: dirs.append(e.path)
+                    elif nm.endswith((".yml", ".yaml")):
+                        yield top, e.path
+                except OSError:
+                    continue
+        for d in dirs:
+            yield from walk(top, d, True)
+
+    yield from walk("", root, False)
+    for d in subdirs:
+        yield from walk(d, os.path.join(root, d), True)
+
+@lru_cache(maxsize=8192)
 def _sanitize_id(prefix: str, name: str) -> str:
     # Mermaid node IDs must be unique and safe; keep readable.
-    safe = re.sub(r"[^A-Za-z0-9:_\-/\.]", "_", name)
+    # Cached: the same (prefix, name) recurs for every dep, link and variant.
+    safe = _RE_SANITIZE.sub("_", name)
     return f"{prefix}:{safe}"
 
+@lru_cache(maxsize=4096)
+def _variants(nm: str):
+    # support common -svc,-service,-api patterns loosely; ordered by preference
+    base = _RE_SVC_SUFFIX.sub("", nm)
+    return tuple(dict.fromkeys((nm, base, base+"-svc", base+"-service", base+"-api", base+"-app")))
+
 # ---------------------------- Compose scanner ----------------------------
 
-def _parse_compose_services(text: str):
+def _parse_compose_services(lines: Iterable[bytes]):
     """
-    Naive YAML-ish parser tailored for docker-compose:
+    Naive YAML-ish parser tailored for docker-compose, fed bytes lines (e.g. a file opened "rb"):
     - detects services by indentation under 'services:'
     - collects 'ports' (host:container[/proto]) and 'depends_on' (list or map)
     - collects 'networks' (names)
     Returns: dict[name] = {"ports":[(host,container)], "depends":[name], "nets":[...]}
     """
-    lines = text.splitlines()
     services = {}
     in_services = False
     svc_name = None
-    for i, ln in enumerate(lines):
-        if re.match(r"^\s*services\s*:\s*$", ln):
-            in_services = True; svc_name = None; continue
-        if in_services:
-            # New service (indented key)
-            ms = re.match(r"^\s{2,}([A-Za-z0-9._-]+)\s*:\s*$", ln)
-            if ms:
-                svc_name = ms.group(1)
+    base = svc_indent = key_indent = child_indent = 0
+    cur_key = None  # a _COMPOSE_SUBKEYS value while walking that block, else None
+    for ln in lines:
+        m = _RE_COMPOSE_LINE.match(ln)
+        if m is None: continue
+        what = m.lastgroup
+        n = m.end("indent")
+        if what == "services":
+            in_services = True; svc_name = None; cur_key = None
+            base = n; svc_indent = None
+            continue
+        if not in_services: continue
+        if what == "key":
+            # Exit services block if dedented to root key
+            if n <= base:
+                in_services = False; svc_name = None; cur_key = None
+                continue
+            # New service (first indentation level under 'services:')
+            if svc_indent is None: svc_indent = n
+            if n <= svc_indent:
+                svc_name = m.group("keyname").decode()
                 services[svc_name] = {"ports": [], "depends": [], "nets": []}
+                cur_key = None; key_indent = None
                 continue
-            # Exit services block if dedented to root key
-            if svc_name is None and re.match(r"^[A-Za-z].*:\s*$", ln):
-                in_services = False
+            if svc_name is None: continue
+            # Service-level key: (re)enter or leave a tracked sub-key block
+            if key_indent is None or n <= key_indent:
+                cur_key = _COMPOSE_SUBKEYS.get(m.group("keyname"))
+                key_indent = n; child_indent = None
                 continue
-            if svc_name:
-                # ports items
-                pitem = re.match(r'^\s{6,}-\s*"?(\d+)\s*:\s*(\d+)(?:/(tcp|udp))?"?\s*$', ln)
-                if pitem:
-                    services[svc_name]["ports"].append((pitem.group(1), pitem.group(2)))
-                # depends_on: list items
-                ditem = re.match(r"^\s{6,}-\s*([A-Za-z0-9._-]+)\s*$", ln)
-                if ditem and "depends_on" in (lines[i-1] if i>0 else ""):
-                    services[svc_name]["depends"].append(ditem.group(1))
-                # depends_on as map:
-                dmap = re.match(r"^\s{6,}([A-Za-z0-9._-]+)\s*:\s*\{\s*condition\s*:\s*[A-Za-z_]+\s*\}\s*$", ln)
-                if dmap and "depends_on" in (lines[i-1] if i>0 else ""):
-                    services[svc_name]["depends"].append(dmap.group(1))
-                # networks list
-                nitem = re.match(r"^\s{6,}-\s*([A-Za-z0-9._-]+)\s*$", ln)
-                if nitem and "networks" in (lines[i-1] if i>0 else ""):
-                    services[svc_name]["nets"].append(nitem.group(1))
+            # Map form of depends_on / networks: first level of keys under the block
+            if cur_key in ("depends_on", "networks") and child_indent in (None, n):
+                child_indent = n
+                services[svc_name]["depends" if cur_key == "depends_on" else "nets"].append(m.group("keyname").decode())
+            continue
+        # list items ('-' may sit at the same indentation as its key)
+        if svc_name is None or cur_key is None or n < key_indent: continue
+        if what == "port" and cur_key == "ports":
+            services[svc_name]["ports"].append((m.group("host").decode(), m.group("container").decode()))
+        elif what == "item" and cur_key != "ports":
+            services[svc_name]["depends" if cur_key == "depends_on" else "nets"].append(m.group("itemname").decode())
     return services
 
 # ---------------------------- Kubernetes scanner ----------------------------
 
-def _parse_k8s_units(text: str):
+def _parse_k8s_units(lines: Iterable[bytes]):
     """
-    Minimal scanner for Kubernetes docs:
+    Minimal scanner for Kubernetes docs, fed bytes lines (e.g. a file opened "rb"):
     - detects 'kind:' and first matching 'metadata: name:'
     - captures 'containerPort:' and Service 'port:' lines
     - captures 'type:' for Service (NodePort/LoadBalancer) and Ingress presence
     Returns list of dict(kind,name,ports,set('public'?) )
     """
-    docs = re.split(r"\n---\s*\n", text) if "---" in text else [text]
+    # Only the current doc is buffered; a '---' line (trailing whitespace allowed) ends it.
     units = []
-    for doc in docs:
-        kind = None; name = None; ports = set(); svc_type = None; is_ingress = False
-        for ln in doc.splitlines():
-            m1 = re.match(r"^\s*kind\s*:\s*(Deployment|StatefulSet|DaemonSet|Service|Ingress)\s*$", ln)
+    doc = []
+    for ln in lines:
+        if ln.startswith(b"---") and ln.rstrip() == b"---":
+            u = _parse_k8s_doc(doc)
+            if u is not None: units.append(u)
+            doc = []
+        else:
+            doc.append(ln)
+    u = _parse_k8s_doc(doc)
+    if u is not None: units.append(u)
+    return units
+
+def _parse_k8s_doc(doc: List[bytes]):
+    kind = None; name = None; ports = set(); svc_type = None
+    # Only the top-level 'spec:' block (or a List's 'items:') carries ports/type. Until
+    # the first top-level key we don't know where we are, so fully indented docs are
+    # still scanned whole.
+    in_spec = True; spec_seen = False
+    for ln in doc:
+        s = ln.lstrip()
+        # comments and Helm template directives ({{- if ... }}) carry nothing
+        if not s or s.startswith((b"#", b"{{")): continue
+        top = len(s) == len(ln) and _RE_TOP_KEY.match(ln) is not None
+        if top:
+            # top-level key; leaving spec with kind and name known means nothing is left to find
+            if spec_seen and in_spec and kind and name: break
+            in_spec = _RE_SPEC_KEY.match(ln) is not None
+            spec_seen = spec_seen or in_spec
+        if s.startswith(b"kind"):
+            m1 = _RE_KIND.match(ln)
             if m1:
-                kind = m1.group(1); continue
-            if name is None:
-                m2 = re.match(r"^\s*name\s*:\s*([a-z0-9\-_.]+)\s*$", ln)
-                if m2:
-                    name = m2.group(1); continue
-            # ports
-            mcp = re.search(r"containerPort\s*:\s*(\d+)", ln)
-            if mcp: ports.add(mcp.group(1))
-            msp = re.search(r"\bport\s*:\s*(\d+)", ln)
-            if msp and (kind == "Service"):
-                ports.add(msp.group(1))
-            # service type
+                kind = m1.group(1).decode()
+                if kind == "Ingress" and name: break
+                continue
+            if top and not _RE_LIST_KIND.match(ln):
+                return None  # ConfigMap, HPA, ...: nested kind/name lines would only mislead
+        if name is None and s.startswith(b"name"):
+            m2 = _RE_NAME.match(ln)
+            if m2:
+                name = m2.group(1).decode()
+                if kind == "Ingress": break
+                continue
+        if not in_spec: continue
+        # ports
+        if b"ort" in s:
+            mcp = _RE_CONTAINER_PORT.search(ln)
+            if mcp: ports.add(mcp.group(1).decode())
             if kind == "Service":
-                mt = re.search(r"\btype\s*:\s*(LoadBalancer|NodePort)\b", ln, flags=re.I)
-                if mt: svc_type = mt.group(1)
-            # ingress
-            if kind == "Ingress":
-                is_ingress = True
-        if kind and name:
-            units.append({"kind": kind, "name": name, "ports": ports, "svc_type": svc_type, "ingress": is_ingress})
-    return units
+                msp = _RE_PORT.search(ln)
+                if msp: ports.add(msp.group(1).decode())
+        # service type
+        if kind == "Service" and b"type" in s.lower():
+            mt = _RE_SVC_TYPE.search(ln)
+            if mt: svc_type = mt.group(1).decode()
+    if kind and name:
+        return {"kind": kind, "name": name, "ports": ports, "svc_type": svc_type, "ingress": kind == "Ingress"}
+    return None
 
 # ---------------------------- package.json & .env sniffers ----------------------------
 
@@ -178,13 +341,14 @@ def _sniff_package_json(root: str):
     p = os.path.join(root, "package.json")
     if os.path.isfile(p):
         try:
-            data = json.loads(_safe_read(p))
+            import json  # deferred: only needed when a package.json exists
+            data = json.loads(_safe_read(p).decode("utf-8", errors="ignore"))
             deps = {**(data.get("dependencies") or {}), **(data.get("devDependencies") or {})}
             for k in deps:
-                if any(k.lower() == h for h in FRAMEWORK_HINTS):
+                if k.lower() in FRAMEWORK_HINTS:
                     frameworks.append(k)
             for s in (data.get("scripts") or {}).values():
-                m = re.search(r"PORT\s*=\s*(\d+)", s) or re.search(r"--port\s+(\d+)", s)
+                m = _RE_PORT_ENV.search(s) or _RE_PORT_FLAG.search(s)
                 if m: port = m.group(1); break
         except Exception:
             pass
@@ -193,85 +357,115 @@ def _sniff_package_json(root: str):
 def _sniff_env(root: str):
     # scan .env and .env.* (but not large binaries); collect DB/broker hints
     hints = set()
-    candidates = [os.path.join(root, ".env")] + glob.glob(os.path.join(root, ".env.*"))
-    for p in candidates[:20]:
-        if not os.path.isfile(p): continue
-        text = _safe_read(p).lower()
-        for needle, label in DB_HINTS.items():
-            if needle in text:
-                hints.add(label)
+    try:
+        it = os.scandir(root)
+    except OSError:
+        return hints
+    seen = 0
+    with it:
+        for e in it:
+            nm = e.name
+            if not (nm == ".env" or nm.startswith(".env.")): continue
+            try:
+                # follows symlinks on purpose: a linked shared .env is common
+                if not e.is_file() or e.stat().st_size > MAX_ENV_BYTES: continue
+            except OSError:
+                continue
+            hints.update(_DB_HINT_LABEL[m.group(0).lower()] for m in _RE_DB_HINT.finditer(_safe_read(e.path)))
+            seen += 1
+            if seen >= 20: break
     return hints
 
 # ---------------------------- Graph assembly ----------------------------
 
+def _parse_file(job):
+    # stream the file through the parser instead of holding it (and a line list) in memory
+    kind, path = job
+    parse = _parse_compose_services if kind == "compose" else _parse_k8s_units
+    f = _safe_open(path)
+    if f is None:
+        return parse(())
+    try:
+        size = os.fstat(f.fileno()).st_size
+        if size > MAX_YAML_BYTES:
+            print(f"warning: skipping {path}: {size} bytes exceeds {MAX_YAML_BYTES}", file=sys.stderr)
+            return parse(())
+        return parse(f)
+    except OSError:
+        return parse(())
+    finally:
+        f.close()
+
+def _parse_files(jobs):
+    # File reads block on disk; fan them out, results come back in job order.
+    if len(jobs) < 2:
+        return [_parse_file(j) for j in jobs]
+    from concurrent.futures import ThreadPoolExecutor  # deferred: keeps `import core` light
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4, len(jobs))) as ex:
+        return list(ex.map(_parse_file, jobs))
+
 def scan_repo(root: str) -> Graph:
     g = Graph()
-    # compose files at root
-    compose_files = glob.glob(os.path.join(root, "docker-compose*.y*ml"))
-    # k8s manifests under common folders
-    k8s_files = []
-    for d in ("k8s","kubernetes","deploy","manifests","charts"):
-        k8s_files += glob.glob(os.path.join(root, d, "**", "*.y*ml"), recursive=True)
+    # compose files at root, k8s manifests under common folders
+    compose_files, k8s_files = [], []
+    for top, path in _walk_yaml(root):
+        if top:
+            k8s_files.append(path)
+        elif os.path.basename(path).startswith("docker-compose"):
+            compose_files.append(path)
 
     frameworks, pkg_port = _sniff_package_json(root)
     env_hints = _sniff_env(root)
 
+    parsed = _parse_files([("compose", f) for f in compose_files] + [("k8s", f) for f in k8s_files])
     internet_needed = False
 
     # Compose nodes & edges
-    for f in compose_files:
-        services = _parse_compose_services(_safe_read(f))
+    for services in parsed[:len(compose_files)]:
         for name, info in services.items():
             nid = _sanitize_id("compose", name)
             ports = {h for (h, c) in info["ports"]}
             n = g.node(nid, label=f"{name}{(':'+','.join(sorted(ports))) if ports else ''}", group="compose", ports=ports)
-            if ports: n.tags.add("public"); internet_needed = True
+            if ports: g.tag(n, "public"); internet_needed = True
             for dep in info["depends"]:
                 did = _sanitize_id("compose", dep)
                 g.node(did, label=dep, group="compose")
                 g.link(nid, did, "depends_on")
 
     # Kubernetes units & edges
-    svc_names = set()
-    dep_like_names = set()
-    ingress_names = set()
-    for f in k8s_files:
-        for u in _parse_k8s_units(_safe_read(f)):
+    # dicts as ordered sets: O(1) lookups, and links come out in discovery order
+    svc_names = {}
+    dep_like_names = {}
+    ingress_names = {}
+    for units in parsed[len(compose_files):]:
+        for u in units:
             kind, name = u["kind"], u["name"]
             nid = _sanitize_id("k8s", name)
             ports = set(u["ports"]) if u["ports"] else set()
             label_suffix = f":{','.join(sorted(ports))}" if ports else ""
             n = g.node(nid, label=f"{name}{label_suffix}", group="k8s", ports=ports, kind=kind)
             if kind == "Service":
-                n.tags.update({"svc"})
-                svc_names.add(name)
-                if u["svc_type"]: n.tags.add("public"); internet_needed = True
+                g.tag(n, "svc")
+                svc_names[name] = None
+                if u["svc_type"]: g.tag(n, "public"); internet_needed = True
             elif kind in ("Deployment","StatefulSet","DaemonSet"):
-                n.tags.update({"workload"})
-                dep_like_names.add(name)
+                g.tag(n, "workload")
+                dep_like_names[name] = None
             elif kind == "Ingress":
-                n.tags.update({"ingress", "public"}); internet_needed = True
-                ingress_names.add(name)
+                g.tag(n, "ingress", "public"); internet_needed = True
+                ingress_names[name] = None
 
     # Heuristic links within K8s: Service -> Workload (same/base name), Ingress -> Service (same/base)
-    def _variants(nm: str):
-        # support common -svc,-service,-api patterns loosely
-        base = re.sub(r"-(svc|service)$", "", nm)
-        return {nm, base, base+"-svc", base+"-service", base+"-api", base+"-app"}
-
-    for s in list(svc_names):
-        sid = _sanitize_id("k8s", s)
-        candidates = _variants(s)
-        match = next((d for d in dep_like_names if d in candidates), None)
+    # probe each name's few variants against the other side instead of scanning it
+    for s in svc_names:
+        match = next((v for v in _variants(s) if v in dep_like_names), None)
         if match:
-            g.link(sid, _sanitize_id("k8s", match), "selects")
+            g.link(_sanitize_id("k8s", s), _sanitize_id("k8s", match), "selects")
 
-    for ig in list(ingress_names):
-        iid = _sanitize_id("k8s", ig)
-        candidates = _variants(ig)
-        match = next((s for s in svc_names if s in candidates), None)
+    for ig in ingress_names:
+        match = next((v for v in _variants(ig) if v in svc_names), None)
         if match:
-            g.link(iid, _sanitize_id("k8s", match), "routes")
+            g.link(_sanitize_id("k8s", ig), _sanitize_id("k8s", match), "routes")
 
     # External DB nodes (from env hints)
     for label in sorted(env_hints):
@@ -280,22 +474,24 @@ def scan_repo(root: str) -> Graph:
     # Link runtime services to DBs (best-effort)
     if env_hints:
         target_ext = _sanitize_id("ext", sorted(env_hints)[0].lower())
-        for n in list(g.nodes.values()):
-            if n.group in ("compose","k8s") and (("svc" in n.tags) or ("workload" in n.tags) or (n.group=="compose")):
+        for n in g.in_group("compose"):
+            g.link(n.id, target_ext, "uses")
+        for n in g.in_group("k8s"):
+            if ("svc" in n.tags) or ("workload" in n.tags):
                 g.link(n.id, target_ext, "uses")
 
     # Internet node if any public exposure
     if internet_needed:
         g.node("ext:internet", label="Internet", group="external", add_tag="public")
-        for n in list(g.nodes.values()):
-            if (("public" in n.tags) and n.id != "ext:internet"):
+        for n in g.public_nodes():
+            if n.id != "ext:internet":
                 g.link("ext:internet", n.id)
 
     # Summary text
-    n_compose = len([n for n in g.nodes.values() if n.group=="compose"])
-    n_k8s = len([n for n in g.nodes.values() if n.group=="k8s"])
-    n_ext = len([n for n in g.nodes.values() if n.group=="external"])
-    exposures = len([n for n in g.nodes.values() if "public" in n.tags])
+    n_compose = len(g.in_group("compose"))
+    n_k8s = len(g.in_group("k8s"))
+    n_ext = len(g.in_group("external"))
+    exposures = len(g.public_nodes())
     g.summary = (
         f"Compose: {n_compose} · K8s: {n_k8s} · External: {n_ext} · "
         f"Frameworks: {', '.join(frameworks) if frameworks else 'n/a'}"
@@ -306,51 +502,74 @@ def scan_repo(root: str) -> Graph:
 
 # ---------------------------- Mermaid rendering ----------------------------
 
+# Constant blocks, built once instead of line by line on every render.
+_THEME_PLAIN = "%%{init: {'flowchart': {'curve': 'monotoneX'}}}%%"
+_THEME_DARK = ("%%{init: {'theme':'dark','flowchart':{'curve':'monotoneX'},"
+               "'themeVariables':{'primaryColor':'#0ea5e9','primaryTextColor':'#ffffff','lineColor':'#38bdf8'}}}%%")
+_THEME_LIGHT = ("%%{init: {'theme':'base','flowchart':{'curve':'monotoneX'},"
+                "'themeVariables':{'primaryColor':'#0ea5e9','primaryTextColor':'#111827','lineColor':'#0ea5e9'}}}%%")
+_CLASSDEFS_FANCY = "\n".join((
+    "  classDef compose fill:#0ea5e9,stroke:#0369a1,color:#fff,stroke-width:1px;",
+    "  classDef k8s fill:#22c55e,stroke:#166534,color:#062;",
+    "  classDef external fill:#e2e8f0,stroke:#64748b,color:#111;",
+    "  classDef public stroke-dasharray: 3 2,stroke-width:2px;",
+    "  classDef db fill:#fde68a,stroke:#b45309,color:#3b2f00;",
+))
+_LEGEND = "\n".join((
+    "  %% Legend",
+    "  subgraph Legend",
+    "    legend_compose[Compose]:::compose",
+    "    legend_k8s[Kubernetes]:::k8s",
+    "    legend_ext[External]:::external",
+    "    legend_pub[Public Exposure]:::public",
+    "    legend_db(DB Service):::db",
+    "  end",
+))
+
 def _theme_block(theme: str):
     # theme presets via Mermaid init directive (GitHub supports this)
     # 'auto' uses dark if GITHUB_DARK_MODE / terminal hint, else light.
     if theme == "auto":
         prefer_dark = any(os.getenv(k) for k in ("GITHUB_DARK_MODE","DARK","THEME_DARK"))
         theme = "dark" if prefer_dark else "light"
-    if theme == "plain":
-        return "%%{init: {'flowchart': {'curve': 'monotoneX'}}}%%"
     if theme == "dark":
-        return ("%%{init: {'theme':'dark','flowchart':{'curve':'monotoneX'},"
-                "'themeVariables':{'primaryColor':'#0ea5e9','primaryTextColor':'#ffffff','lineColor':'#38bdf8'}}}%%")
+        return _THEME_DARK
     if theme == "light":
-        return ("%%{init: {'theme':'base','flowchart':{'curve':'monotoneX'},"
-                "'themeVariables':{'primaryColor':'#0ea5e9','primaryTextColor':'#111827','lineColor':'#0ea5e9'}}}%%")
-    return "%%{init: {'flowchart': {'curve': 'monotoneX'}}}%%"
+        return _THEME_LIGHT
+    return _THEME_PLAIN
+
+def _render_parts(n: Node):
+    if n.render_shape is None:
+        n.render_shape = "()" if "db" in n.tags else "[]"
+        n.render_classes = (n.group,) + tuple(t for t in ("public", "db") if t in n.tags)
+    return n.render_shape, n.render_classes
 
 def build_mermaid(g: Graph, *, theme="auto", style="fancy", include_legend=True) -> str:
-    lines = []
-    lines.append("```mermaid")
-    lines.append(_theme_block(theme))
-    lines.append("flowchart LR")
+    # one write buffer, every chunk carries its own "\n"
+    buf = io.StringIO()
+    w = buf.write
+    w("```mermaid\n"); w(_theme_block(theme)); w("\nflowchart LR\n")
+    fancy = style != "plain"
 
     # classes
-    if style != "plain":
-        lines.append("  classDef compose fill:#0ea5e9,stroke:#0369a1,color:#fff,stroke-width:1px;")
-        lines.append("  classDef k8s fill:#22c55e,stroke:#166534,color:#062;")
-        lines.append("  classDef external fill:#e2e8f0,stroke:#64748b,color:#111;")
-        lines.append("  classDef public stroke-dasharray: 3 2,stroke-width:2px;")
-        lines.append("  classDef db fill:#fde68a,stroke:#b45309,color:#3b2f00;")
+    if fancy:
+        w(_CLASSDEFS_FANCY); w("\n")
 
     def subgraph(title, group):
-        items = [n for n in g.nodes.values() if n.group==group]
+        items = g.in_group(group)
         if not items: return
-        lines.append(f"  subgraph {title}")
-        for n in items:
-            shape_open = "(" if "db" in n.tags else "["
-            shape_close = ")" if "db" in n.tags else "]"
-            lines.append(f"    \"{n.id}\"{shape_open}{_esc(n.label)}{shape_close}")
-            if style != "plain":
-                lines.append(f"    class \"{n.id}\" {group};")
-                if "public" in n.tags:
-                    lines.append(f"    class \"{n.id}\" public;")
-                if "db" in n.tags:
-                    lines.append(f"    class \"{n.id}\" db;")
-        lines.append("  end")
+        w(f"  subgraph {title}\n")
+        if fancy:
+            for n in items:
+                shape, classes = _render_parts(n)
+                w(f'    "{n.id}"{shape[0]}{_esc(n.label)}{shape[1]}\n')
+                for c in classes:
+                    w(f'    class "{n.id}" {c};\n')
+        else:
+            for n in items:
+                shape = _render_parts(n)[0]
+                w(f'    "{n.id}"{shape[0]}{_esc(n.label)}{shape[1]}\n')
+        w("  end\n")
 
     subgraph("Compose", "compose")
     subgraph("Kubernetes", "k8s")
@@ -359,23 +578,14 @@ def build_mermaid(g: Graph, *, theme="auto", style="fancy", include_legend=True)
     # Edges
     for e in g.edges:
         label = f" |{_esc(e.label)}|" if e.label else ""
-        lines.append(f"  \"{e.src}\" -->{label} \"{e.dst}\"")
+        w(f"  \"{e.src}\" -->{label} \"{e.dst}\"\n")
 
     # Legend
     if include_legend:
-        lines.extend([
-            "  %% Legend",
-            "  subgraph Legend",
-            "    legend_compose[Compose]:::compose",
-            "    legend_k8s[Kubernetes]:::k8s",
-            "    legend_ext[External]:::external",
-            "    legend_pub[Public Exposure]:::public",
-            "    legend_db(DB Service):::db",
-            "  end"
-        ])
-
-    lines.append("```")
-    return "\n".join(lines)
+        w(_LEGEND); w("\n")
+
+    w("```")
+    return buf.getvalue()
 
 def _esc(s: str) -> str:
     return s.replace("\"","'")